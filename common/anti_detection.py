@@ -1,45 +1,248 @@
 # common/anti_detection.py
+import os
 import random
 import asyncio
-from playwright.async_api import TimeoutError as PWTimeout
-
-USER_AGENTS = [
-    # Windows Chrome
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-    # Mac Safari
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
-    # Linux Chrome
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.5993.117 Safari/537.36",
-]
-
-async def goto_resilient(page, url: str, retries: int = 3, timeout: int = 30000):
-    """Navigate to a page with retries + human-like delays."""
+from dataclasses import dataclass
+
+# Optional stealth backend: set STEALTH_BACKEND=patchright to drive Chromium via
+# Patchright (patched Playwright that injects scripts without Runtime.enable,
+# which detectors fingerprint). Falls back to vanilla Playwright when the
+# package isn't installed.
+USING_PATCHRIGHT = False
+if os.getenv("STEALTH_BACKEND", "").lower() == "patchright":
+    try:
+        from patchright.async_api import async_playwright
+        from patchright.async_api import TimeoutError as PWTimeout
+        USING_PATCHRIGHT = True
+    except ImportError:
+        from playwright.async_api import async_playwright
+        from playwright.async_api import TimeoutError as PWTimeout
+else:
+    from playwright.async_api import async_playwright
+    from playwright.async_api import TimeoutError as PWTimeout
+
+# Built once at import; each new context pays only the CDP send cost,
+# not a per-call Python string build.
+_INIT_SCRIPT = r"""Object.defineProperty(navigator, 'webdriver', {get: () => undefined});"""
+
+def get_init_script(profile=None, include_webdriver: bool = True) -> str:
+    """Return the anti-detection init script, optionally templated so
+    navigator.platform / hardwareConcurrency / WebGL match `profile`.
+
+    Pass include_webdriver=False where the backend already masks
+    navigator.webdriver itself (Patchright) and only the fingerprint
+    alignment is needed."""
+    script = _INIT_SCRIPT if include_webdriver else ""
+    if profile is None:
+        return script
+    return script + f"""
+Object.defineProperty(navigator, 'platform', {{get: () => '{profile.platform}'}});
+Object.defineProperty(navigator, 'hardwareConcurrency', {{get: () => {profile.hardware_concurrency}}});
+Object.defineProperty(navigator, 'deviceMemory', {{get: () => {profile.device_memory}}});
+const _glGetParameter = WebGLRenderingContext.prototype.getParameter;
+WebGLRenderingContext.prototype.getParameter = function(p) {{
+    if (p === 37445) return '{profile.webgl_vendor}';
+    if (p === 37446) return '{profile.webgl_renderer}';
+    return _glGetParameter.call(this, p);
+}};"""
+
+@dataclass(frozen=True)
+class StealthProfile:
+    """A coherent fingerprint bundle — UA, platform, WebGL, and hardware
+    values that belong together. Picking one atomically avoids the
+    mismatches detectors flag (e.g. Windows UA with MacIntel platform)."""
+    user_agent: str
+    platform: str
+    webgl_vendor: str
+    webgl_renderer: str
+    hardware_concurrency: int
+    device_memory: int
+    viewport: dict
+
+PROFILES: tuple = (
+    StealthProfile(
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+        platform="Win32",
+        webgl_vendor="Google Inc. (NVIDIA)",
+        webgl_renderer="ANGLE (NVIDIA, NVIDIA GeForce GTX 1660 Direct3D11 vs_5_0 ps_5_0, D3D11)",
+        hardware_concurrency=8,
+        device_memory=8,
+        viewport={"width": 1536, "height": 864},
+    ),
+    StealthProfile(
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        platform="Win32",
+        webgl_vendor="Google Inc. (Intel)",
+        webgl_renderer="ANGLE (Intel, Intel(R) UHD Graphics 630 Direct3D11 vs_5_0 ps_5_0, D3D11)",
+        hardware_concurrency=12,
+        device_memory=16,
+        viewport={"width": 1920, "height": 1080},
+    ),
+    StealthProfile(
+        user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+        platform="MacIntel",
+        webgl_vendor="Google Inc. (Apple)",
+        webgl_renderer="ANGLE (Apple, Apple M1, OpenGL 4.1)",
+        hardware_concurrency=8,
+        device_memory=8,
+        viewport={"width": 1440, "height": 900},
+    ),
+    StealthProfile(
+        user_agent="Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.5993.117 Safari/537.36",
+        platform="Linux x86_64",
+        webgl_vendor="Google Inc. (Intel)",
+        webgl_renderer="ANGLE (Intel, Mesa Intel(R) Xe Graphics (TGL GT2), OpenGL 4.6)",
+        hardware_concurrency=8,
+        device_memory=8,
+        viewport={"width": 1600, "height": 900},
+    ),
+    StealthProfile(
+        user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        platform="MacIntel",
+        webgl_vendor="Google Inc. (Apple)",
+        webgl_renderer="ANGLE (Apple, Apple M2, OpenGL 4.1)",
+        hardware_concurrency=10,
+        device_memory=16,
+        viewport={"width": 1680, "height": 1050},
+    ),
+)
+
+def _pick_profile() -> StealthProfile:
+    """Select one internally-consistent fingerprint profile."""
+    return random.choice(PROFILES)
+
+# Precomputed jitter schedule: draw unit samples once at import and scale
+# per call, instead of paying random.uniform machinery on every delay.
+# Reseed with seed_jitter() for reproducible humanization in tests.
+_JITTER_POOL_SIZE = 4096
+_JITTER_POOL = [random.random() for _ in range(_JITTER_POOL_SIZE)]
+_jitter_idx = 0
+
+def seed_jitter(seed: int):
+    """Regenerate the jitter pool deterministically."""
+    global _JITTER_POOL, _jitter_idx
+    rng = random.Random(seed)
+    _JITTER_POOL = [rng.random() for _ in range(_JITTER_POOL_SIZE)]
+    _jitter_idx = 0
+
+def next_jitter(a: float, b: float) -> float:
+    """Next delay from the precomputed schedule, scaled into [a, b)."""
+    global _jitter_idx
+    u = _JITTER_POOL[_jitter_idx % _JITTER_POOL_SIZE]
+    _jitter_idx += 1
+    return a + u * (b - a)
+
+# Cap in-flight navigations per process so gather-based callers can't
+# hammer the target host into 429s, independent of their page concurrency.
+_NAV_LIMIT = 8
+_nav_sems: dict = {}  # one semaphore per event loop
+
+def set_nav_limit(limit: int):
+    """Change the global navigation cap (takes effect on next acquire)."""
+    global _NAV_LIMIT
+    _NAV_LIMIT = limit
+    _nav_sems.clear()
+
+def _nav_semaphore() -> asyncio.BoundedSemaphore:
+    loop = asyncio.get_running_loop()
+    sem = _nav_sems.get(loop)
+    if sem is None:
+        sem = asyncio.BoundedSemaphore(_NAV_LIMIT)
+        _nav_sems[loop] = sem
+    return sem
+
+async def goto_resilient(page, url: str, retries: int = 3, timeout: int = 30000,
+                         ready_selector: str = None,
+                         initial_delay: float = 1.0, growth: float = 2.0,
+                         max_delay: float = 30.0):
+    """Navigate to a page with retries + human-like delays.
+
+    When ready_selector is given, wait for it instead of sleeping a fixed
+    2-4s — returns as soon as the content we need actually exists.
+    Retries back off exponentially with jitter (capped at max_delay) so
+    parallel workers don't hammer the target in lockstep.
+    """
+    sem = _nav_semaphore()
     for attempt in range(retries):
         try:
-            await page.goto(url, timeout=timeout, wait_until="domcontentloaded")
-            await asyncio.sleep(random.uniform(2, 4))  # mimic human pause
+            async with sem:
+                await page.goto(url, timeout=timeout, wait_until="domcontentloaded")
+                if ready_selector:
+                    await page.wait_for_selector(ready_selector, timeout=timeout)
+                else:
+                    await asyncio.sleep(next_jitter(0.3, 0.8))  # short human-like jitter
             return True
         except PWTimeout:
-            wait_time = 2 ** attempt
-            print(f"⚠️ Timeout loading {url}, retrying in {wait_time}s...")
-            await asyncio.sleep(wait_time)
+            delay = min(initial_delay * (growth ** attempt), max_delay)
+            delay *= next_jitter(0.5, 1.5)
+            print(f"⚠️ Timeout loading {url}, retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
     print(f"❌ Failed to load {url} after {retries} retries")
     return False
 
-async def create_stealth_context(browser):
-    """Create stealth browser context with random UA, viewport, and webdriver patch."""
-    ua = random.choice(USER_AGENTS)
-    viewport = {
-        "width": random.randint(1280, 1600),
-        "height": random.randint(720, 900),
-    }
-
-    context = await browser.new_context(
-        user_agent=ua,
-        viewport=viewport,
+# Resource types that only cost bandwidth/render time for a DOM scraper
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+
+# Third-party telemetry/ad hosts — nothing we scrape depends on them
+BLOCKED_HOST_FRAGMENTS = (
+    "googletagmanager.com",
+    "google-analytics.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "branch.io",
+    "scorecardresearch.com",
+)
+
+async def _block_heavy(route, request):
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    elif any(host in request.url for host in BLOCKED_HOST_FRAGMENTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def save_storage_state(context, path: str = "tw_state.json") -> str:
+    """Snapshot a context's cookies/local storage for reuse via
+    create_stealth_context(storage_state=path)."""
+    await context.storage_state(path=path)
+    return path
+
+async def type_like_a_human(page, selector: str, text: str):
+    """Type into a field with human-like keystroke pacing.
+
+    Uses a single page.type(delay=...) call — Playwright paces keystrokes
+    browser-side, so there's one round trip for the whole string instead
+    of two per character (and focus is handled implicitly).
+    """
+    await page.type(selector, text, delay=random.randint(30, 180))
+
+async def create_stealth_context(browser, block_resources: bool = True,
+                                 storage_state: str = None):
+    """Create stealth browser context from a coherent fingerprint profile.
+
+    Pass storage_state (a path from save_storage_state) to restore a
+    previous session's cookies/local storage — gated profile pages then
+    skip the login-wall redirect entirely.
+    """
+    profile = _pick_profile()
+
+    context_opts = dict(
+        user_agent=profile.user_agent,
+        viewport=dict(profile.viewport),
         locale="en-US",
     )
+    if storage_state and os.path.exists(storage_state):
+        context_opts["storage_state"] = storage_state
+    context = await browser.new_context(**context_opts)
+
+    # Align JS-visible fingerprint with the chosen UA — platform/WebGL
+    # must match regardless of backend; only the webdriver patch is
+    # redundant under Patchright, which masks it natively
+    await context.add_init_script(
+        get_init_script(profile, include_webdriver=not USING_PATCHRIGHT)
+    )
 
-    # Patch webdriver property
-    await context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    # Drop images/media/fonts/styles — pure cost when we only read the DOM
+    if block_resources:
+        await context.route("**/*", _block_heavy)
     return context
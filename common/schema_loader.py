@@ -1,9 +1,19 @@
-import json
+import copy
 import os
+import orjson
+
+_SCHEMA = None
 
 def load_schema():
-    """Load schema_template.json from the common folder"""
-    base_dir = os.path.dirname(__file__)
-    schema_path = os.path.join(base_dir, "schema_template.json")
-    with open(schema_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """Load schema_template.json from the common folder.
+
+    Parsed once per process and cached; callers get a deep copy so the
+    cached template can't be mutated from outside.
+    """
+    global _SCHEMA
+    if _SCHEMA is None:
+        base_dir = os.path.dirname(__file__)
+        schema_path = os.path.join(base_dir, "schema_template.json")
+        with open(schema_path, "rb") as f:
+            _SCHEMA = orjson.loads(f.read())
+    return copy.deepcopy(_SCHEMA)
@@ -1,12 +1,41 @@
 # scraper_types/twitter_scraper_meta.py
+import asyncio
+import json
+import os
 import re, time
+from functools import lru_cache
 from typing import List, Dict, Optional
-from urllib.parse import urlparse
+from urllib.parse import urlparse, quote
 from playwright.async_api import Page
 from common.anti_detection import goto_resilient
 
+# compiled once at import — these run on every profile's text post-processing
+_COMPACT_RE = re.compile(r"^(\d+(?:\.\d+)?)([km])?$")
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_PHONE_RE = re.compile(r"\+?\d[\d\s().\-]{8,}\d")
+# alternation with named groups: one scan over the text finds both kinds
+_CONTACT_RE = re.compile(
+    r"(?P<email>[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,})"
+    r"|(?P<phone>\+?\d[\d\s().\-]{8,}\d)"
+)
+
+# fast path covers canonical prefixes without parsing; urlparse only runs
+# for odd casings/schemes, and repeats across runs hit the cache
+# one cached parse shared by _is_twitter and the handle fallback
+_parse = lru_cache(maxsize=4096)(urlparse)
+
+_TWITTER_PREFIXES = tuple(
+    f"{scheme}://{www}{host}/"
+    for scheme in ("https", "http")
+    for www in ("", "www.")
+    for host in ("twitter.com", "x.com")
+)
+
+@lru_cache(maxsize=4096)
 def _is_twitter(url: str) -> bool:
-    host = urlparse(url).netloc.lower()
+    if url.startswith(_TWITTER_PREFIXES):
+        return True
+    host = _parse(url).netloc.lower()
     return "twitter.com" in host or "x.com" in host
 
 def _dedupe(seq: List[str]) -> List[str]:
@@ -16,41 +45,93 @@ def _dedupe(seq: List[str]) -> List[str]:
             seen.add(s); out.append(s)
     return out
 
+# strip commas and whitespace in one C-level translate pass
+_STRIP_TBL = str.maketrans("", "", ", \t\n")
+_MULT = {"k": 1_000, "m": 1_000_000}
+
 def _compact_to_int(s: Optional[str]) -> Optional[int]:
     if not s: return None
-    t = s.strip().lower().replace(",", "")
-    m = re.match(r"^(\d+(?:\.\d+)?)([km])?$", t)
+    t = s.translate(_STRIP_TBL).lower()
+    m = _COMPACT_RE.match(t)
     if not m: return None
     num, suf = float(m.group(1)), m.group(2)
-    return int(num * (1_000 if suf == "k" else 1_000_000 if suf == "m" else 1))
+    return int(num * _MULT.get(suf, 1))
 
 def _contacts(text: Optional[str]) -> Dict[str, List[str]]:
     if not text: return {"emails": [], "phones": []}
-    emails = list({m.group(0) for m in re.finditer(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", text)})
-    phones = list({m.group(0) for m in re.finditer(r"\+?\d[\d\s().\-]{8,}\d", text)})
-    return {"emails": emails, "phones": phones}
-
-NAME_SEL = ["div[data-testid='UserName'] span"]
-HANDLE_SEL = ["div[data-testid='UserName'] div span:has-text('@')"]
-BIO_SEL = ["div[data-testid='UserDescription'] span"]
-FOLLOWERS_SEL = ["a[href$='/followers'] span"]
-FOLLOWING_SEL = ["a[href$='/following'] span"]
-
-async def _first_text(page: Page, selectors: List[str]) -> Optional[str]:
-    for sel in selectors:
-        try:
-            el = await page.wait_for_selector(sel, timeout=5000)
-            txt = (await el.text_content() or "").strip()
-            if txt: return txt
-        except Exception: pass
-    return None
-
-async def _extract_profile(page: Page, url: str) -> Dict:
-    name = await _first_text(page, NAME_SEL)
-    handle = await _first_text(page, HANDLE_SEL) or "@" + url.rstrip("/").split("/")[-1]
-    bio = await _first_text(page, BIO_SEL)
-    followers = await _first_text(page, FOLLOWERS_SEL)
-    following = await _first_text(page, FOLLOWING_SEL)
+    emails, phones = [], []
+    for m in _CONTACT_RE.finditer(text):
+        if m.lastgroup == "email":
+            emails.append(m.group())
+        else:
+            phones.append(m.group())
+    # dedupe in document order — deterministic output downstream
+    return {"emails": _dedupe(emails), "phones": _dedupe(phones)}
+
+# CSS selector lists ("a, b") let wait_for_selector race the alternatives
+# in one combined wait instead of serial per-selector timeouts
+NAME_SEL = "div[data-testid='UserName'] span"
+HANDLE_SEL = "div[data-testid='UserName'] div span:has-text('@')"
+BIO_SEL = "div[data-testid='UserDescription'] span"
+FOLLOWERS_SEL = "a[href$='/verified_followers'] span, a[href$='/followers'] span"
+FOLLOWING_SEL = "a[href$='/following'] span"
+
+async def _first_text(page: Page, selector: str) -> Optional[str]:
+    try:
+        el = await page.wait_for_selector(selector, timeout=5000)
+        txt = (await el.text_content() or "").strip()
+        return txt or None
+    except Exception:
+        return None
+
+# One JS round trip for all profile fields instead of 5+ sequential
+# wait_for_selector calls (each its own CDP message)
+_PROFILE_JS = """() => {
+    const text = (sel) => {
+        const el = document.querySelector(sel);
+        return el ? el.innerText.trim() : null;
+    };
+    const handle = Array.from(
+        document.querySelectorAll("div[data-testid='UserName'] span")
+    ).map(e => e.innerText.trim()).find(t => t && t.startsWith('@')) || null;
+    return {
+        name: text("div[data-testid='UserName'] span"),
+        handle: handle,
+        bio: text("div[data-testid='UserDescription']"),
+        followers: text("a[href$='/verified_followers'] span, a[href$='/followers'] span"),
+        following: text("a[href$='/following'] span"),
+    };
+}"""
+
+async def _extract_profile(page: Page, url: str, now: Optional[int] = None) -> Dict:
+    try:
+        await page.wait_for_selector(NAME_SEL, timeout=5000)
+    except Exception:
+        pass
+
+    fields: Dict = {}
+    try:
+        fields = await page.evaluate(_PROFILE_JS) or {}
+    except Exception:
+        fields = {}
+
+    name = fields.get("name")
+    handle = fields.get("handle")
+    bio = fields.get("bio")
+    followers = fields.get("followers")
+    following = fields.get("following")
+
+    if not (name or handle or bio):
+        # slow path: per-selector waits, kept as fallback when the page
+        # hadn't hydrated by evaluate time
+        name = await _first_text(page, NAME_SEL)
+        handle = await _first_text(page, HANDLE_SEL)
+        bio = await _first_text(page, BIO_SEL)
+        followers = await _first_text(page, FOLLOWERS_SEL)
+        following = await _first_text(page, FOLLOWING_SEL)
+
+    # rpartition avoids materializing a full path-segment list
+    handle = handle or "@" + _parse(url).path.rstrip("/").rpartition("/")[2]
 
     return {
         "platform": "twitter",
@@ -62,16 +143,90 @@ async def _extract_profile(page: Page, url: str) -> Dict:
         "followers_num": _compact_to_int(followers),
         "following": following,
         "following_num": _compact_to_int(following),
-        "scraped_at": int(time.time()),
+        "scraped_at": now if now is not None else int(time.time()),
+    }
+
+# Return as soon as the data we need exists — waiting on networkidle-style
+# quiescence never fires cleanly on x.com's continuously-polling feed
+READY_SEL = "div[data-testid='UserName'], article[data-testid='tweet']"
+
+# The GraphQL query id rotates with x.com's web bundle, so both pieces of
+# auth come from the environment; without them the API path is skipped.
+_API_BEARER = os.getenv("TWITTER_BEARER_TOKEN", "")
+_API_QUERY_ID = os.getenv("TWITTER_USER_QUERY_ID", "")
+
+async def _profile_via_api(context, url: str, now: Optional[int] = None) -> Optional[Dict]:
+    """Fetch profile fields from the UserByScreenName JSON endpoint.
+
+    ~10x faster than a headless render when auth is available; returns
+    None on any failure so callers fall back to _extract_profile.
+    """
+    if not (_API_BEARER and _API_QUERY_ID):
+        return None
+    handle = _parse(url).path.rstrip("/").rpartition("/")[2]
+    variables = json.dumps({"screen_name": handle, "withSafetyModeUserFields": True})
+    api = (f"https://api.x.com/graphql/{_API_QUERY_ID}/UserByScreenName"
+           f"?variables={quote(variables)}")
+    try:
+        cookies = await context.cookies("https://x.com")
+        ct0 = next((c["value"] for c in cookies if c["name"] == "ct0"), None)
+        headers = {"authorization": f"Bearer {_API_BEARER}"}
+        if ct0:
+            headers["x-csrf-token"] = ct0
+        r = await context.request.get(api, headers=headers)
+        if r.status != 200:
+            return None
+        data = await r.json()
+        user = data["data"]["user"]["result"]
+        legacy = user["legacy"]
+    except Exception:
+        return None
+
+    followers = legacy.get("followers_count")
+    following = legacy.get("friends_count")
+    return {
+        "platform": "twitter",
+        "twitter_link": url,
+        "name": legacy.get("name"),
+        "handle": "@" + (legacy.get("screen_name") or handle),
+        "bio": legacy.get("description"),
+        "followers": str(followers) if followers is not None else None,
+        "followers_num": followers,
+        "following": str(following) if following is not None else None,
+        "following_num": following,
+        "scraped_at": now if now is not None else int(time.time()),
     }
 
-async def scrape_twitter_profiles_async(urls: List[str], page: Page) -> List[Dict]:
+async def _scrape_one(context, url: str, sem: asyncio.Semaphore, now: Optional[int] = None) -> Dict:
+    async with sem:
+        # cheap JSON path first; render the page only when it fails
+        api_result = await _profile_via_api(context, url, now)
+        if api_result is not None:
+            return api_result
+        page = await context.new_page()
+        try:
+            ok = await goto_resilient(page, url, ready_selector=READY_SEL)
+            if not ok:
+                return {"twitter_link": url, "error": "Navigation failed"}
+            return await _extract_profile(page, url, now)
+        finally:
+            await page.close()
+
+async def scrape_twitter_profiles_async(urls: List[str], context, concurrency: int = 8) -> List[Dict]:
+    """Scrape profiles concurrently — each URL gets its own page from
+    `context`, capped by a semaphore. Navigation is I/O-bound, so wall
+    time drops roughly by the concurrency factor."""
+    norm = [link for link in _dedupe(urls) if _is_twitter(link)]
+    sem = asyncio.Semaphore(concurrency)
+    now = int(time.time())  # one timestamp per batch, not one syscall per row
+    gathered = await asyncio.gather(
+        *[_scrape_one(context, link, sem, now) for link in norm],
+        return_exceptions=True,
+    )
     results: List[Dict] = []
-    for link in _dedupe(urls):
-        if not _is_twitter(link): continue
-        ok = await goto_resilient(page, link)
-        if not ok:
-            results.append({"twitter_link": link, "error": "Navigation failed"})
-            continue
-        results.append(await _extract_profile(page, link))
+    for link, res in zip(norm, gathered):
+        if isinstance(res, BaseException):
+            results.append({"twitter_link": link, "error": str(res)})
+        else:
+            results.append(res)
     return results
@@ -1,31 +1,127 @@
 # scraper_types/twitter_scraper_visible_text.py
+import asyncio
 import re, time
 from typing import List, Dict
 from common.anti_detection import goto_resilient
+from scraper_types.twitter_scraper_meta import _dedupe, _is_twitter
 
-async def scrape_twitter_visible_text_seq(urls: List[str], page) -> List[Dict]:
-    results: List[Dict] = []
-    for url in urls:
-        ok = await goto_resilient(page, url)
-        if not ok:
-            results.append({"twitter_link": url, "error": "Navigation failed"})
-            continue
-
-        # Grab tweets text
-        tweet_texts = []
+_TWEETS_JS = """() => {
+    let nodes = document.querySelectorAll('article[data-testid="tweet"]');
+    if (!nodes.length) nodes = document.querySelectorAll('article');
+    return Array.from(nodes).map(t => ({
+        text: (t.querySelector('div[data-testid="tweetText"]')?.innerText || '').trim(),
+        userHref: t.querySelector('div[data-testid="User-Name"] a')?.getAttribute('href') || '',
+    }));
+}"""
+
+# The whole scroll loop runs browser-side in one evaluate — no CDP round
+# trip per scroll round, and it still exits early when the feed stops growing
+_SCROLL_JS = """async (maxRounds) => {
+    let prev = 0;
+    for (let i = 0; i < maxRounds; i++) {
+        const h = document.body.scrollHeight;
+        if (h === prev) break;
+        prev = h;
+        window.scrollTo(0, h);
+        const grew = await new Promise(resolve => {
+            const started = Date.now();
+            const id = setInterval(() => {
+                if (document.body.scrollHeight > h) { clearInterval(id); resolve(true); }
+                else if (Date.now() - started > 1500) { clearInterval(id); resolve(false); }
+            }, 100);
+        });
+        if (!grew) break;
+    }
+}"""
+
+async def _adaptive_scroll(page, max_rounds: int = 8):
+    """Scroll to load more tweets, polling for height growth instead of
+    sleeping a fixed interval — exits as soon as the feed stops growing,
+    so short profiles pay nothing."""
+    try:
+        await page.evaluate(_SCROLL_JS, max_rounds)
+    except Exception:
+        pass
+
+async def extract_tweets(page) -> List[Dict]:
+    """Scroll the feed and return [{'text', 'userHref'}, ...] for every
+    tweet on an already-navigated page.
+
+    Walks all tweet containers in one evaluate call — text and author
+    link together, instead of ~3 CDP calls per tweet.
+    """
+    await _adaptive_scroll(page)
+    tweets = []
+    try:
+        tweets = await page.evaluate(_TWEETS_JS)
+    except Exception:
+        # fallback: raw element handles — no Locator wrapper, whose
+        # .nth(i) re-runs the selector engine on every access
         try:
-            els = await page.query_selector_all("article div[data-testid='tweetText']")
-            for el in els[:3]:  # limit to few tweets
-                txt = (await el.text_content() or "").strip()
-                if txt: tweet_texts.append(txt)
+            handles = await page.query_selector_all(
+                "article div[data-testid='tweetText']"
+            )
+            # pipeline the per-element fetches over the duplex CDP
+            # transport instead of awaiting them one by one
+            texts = await asyncio.gather(
+                *[h.inner_text() for h in handles],
+                return_exceptions=True,
+            )
+            tweets = [
+                {"text": t.strip(), "userHref": ""}
+                for t in texts if isinstance(t, str)
+            ]
         except Exception:
             pass
+    return tweets
+
+def tweet_fields(tweets: List[Dict]) -> Dict:
+    """Reduce an extract_tweets list to the visible-text result fields."""
+    tweet_texts = [t["text"] for t in tweets if t.get("text")][:3]
+    author_links = []
+    for t in tweets:
+        href = t.get("userHref")
+        if href and href not in author_links:
+            author_links.append(href)
+    return {
+        "main_tweet_text": tweet_texts[0] if tweet_texts else None,
+        "text": "\n".join(tweet_texts),
+        "author_links": author_links,
+    }
 
-        results.append({
-            "platform": "twitter",
-            "twitter_link": url,
-            "main_tweet_text": tweet_texts[0] if tweet_texts else None,
-            "text": "\n".join(tweet_texts),
-            "scraped_at": int(time.time())
-        })
+async def _scrape_one_text(context, url: str, sem: asyncio.Semaphore, now: int = None) -> Dict:
+    async with sem:
+        page = await context.new_page()
+        try:
+            ok = await goto_resilient(page, url, ready_selector="article")
+            if not ok:
+                return {"twitter_link": url, "error": "Navigation failed"}
+
+            tweets = await extract_tweets(page)
+
+            result = {
+                "platform": "twitter",
+                "twitter_link": url,
+                "scraped_at": now if now is not None else int(time.time())
+            }
+            result.update(tweet_fields(tweets))
+            return result
+        finally:
+            await page.close()
+
+async def scrape_twitter_visible_text_seq(urls: List[str], context, concurrency: int = 8) -> List[Dict]:
+    """Collect visible tweet text concurrently, one pooled page per URL."""
+    norm = [url for url in _dedupe(urls) if _is_twitter(url)]
+    sem = asyncio.Semaphore(concurrency)
+    now = int(time.time())  # one timestamp per batch
+    gathered = await asyncio.gather(
+        *[_scrape_one_text(context, url, sem, now) for url in norm],
+        return_exceptions=True,
+    )
+    results: List[Dict] = []
+    for url, res in zip(norm, gathered):
+        if isinstance(res, BaseException):
+            results.append({"twitter_link": url, "error": str(res)})
+        else:
+            results.append(res)
     return results
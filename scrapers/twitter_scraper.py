@@ -1,14 +1,83 @@
 # scrapers/twitter_scraper.py
 import asyncio
-from pathlib import Path
-import sys
+import atexit
+import time
+from collections import defaultdict
+from copy import deepcopy
+from functools import lru_cache
+from itertools import chain
 from typing import List, Dict, Optional
-from playwright.async_api import async_playwright
-from common.browser_manager import get_browser, get_stealth_page
-from scraper_types.twitter_scraper_meta import scrape_twitter_profiles_async, _contacts
-from scraper_types.twitter_scraper_visible_text import scrape_twitter_visible_text_seq
+from common.browser_manager import get_browser, async_playwright, PagePool
+from common.anti_detection import create_stealth_context
+# the split entry points are re-exported here so callers that only need
+# one half keep importing from the canonical orchestrator module
+from scraper_types.twitter_scraper_meta import (
+    scrape_twitter_profiles_async, _contacts, _dedupe, _is_twitter,
+    _extract_profile, _profile_via_api, READY_SEL,
+)
+from scraper_types.twitter_scraper_visible_text import (
+    scrape_twitter_visible_text_seq, extract_tweets, tweet_fields,
+)
+from common.anti_detection import goto_resilient
 from common.db_utils import SCHEMA
 
+# pages held open at once per scrape batch; raise cautiously — each page
+# carries its own JS context and x.com rate-limits aggressively
+MAX_PARALLEL = 4
+
+# passed to goto_resilient so dead URLs fail fast instead of blocking
+# a pool slot for the 30s default per attempt
+NAV_TIMEOUT_MS = 15_000
+
+# ---------------- shared warm browser ----------------
+# Chromium cold start is ~3-5s; callers that invoke main() repeatedly
+# (twitter_test.py loops) pay it once per process instead of per call.
+_PLAYWRIGHT = None
+_BROWSER = None
+_BROWSER_LOOP = None
+_browser_locks: Dict = {}  # one lock per event loop
+
+async def _get_shared_browser(headless: bool = True):
+    global _PLAYWRIGHT, _BROWSER, _BROWSER_LOOP
+    loop = asyncio.get_running_loop()
+    lock = _browser_locks.get(loop)
+    if lock is None:
+        lock = asyncio.Lock()
+        _browser_locks[loop] = lock
+    async with lock:
+        # a browser launched under a previous (now closed) loop is unusable
+        if _BROWSER is None or _BROWSER_LOOP is not loop or not _BROWSER.is_connected():
+            _PLAYWRIGHT = await async_playwright().start()
+            _BROWSER = await get_browser(_PLAYWRIGHT, headless=headless)
+            _BROWSER_LOOP = loop
+    return _BROWSER
+
+async def _shutdown_shared_browser():
+    global _PLAYWRIGHT, _BROWSER, _BROWSER_LOOP
+    if _BROWSER is not None:
+        try:
+            await _BROWSER.close()
+        except Exception:
+            pass
+        _BROWSER = None
+        _BROWSER_LOOP = None
+    if _PLAYWRIGHT is not None:
+        try:
+            await _PLAYWRIGHT.stop()
+        except Exception:
+            pass
+        _PLAYWRIGHT = None
+
+def _shutdown_at_exit():
+    if _BROWSER is None and _PLAYWRIGHT is None:
+        return
+    try:
+        asyncio.run(_shutdown_shared_browser())
+    except Exception:
+        pass
+
+atexit.register(_shutdown_at_exit)
+
 TWITTER_ALIAS: Dict[str, list] = {
     "url": ["twitter_link", "url"],
     "profile.username": ["handle", "username"],
@@ -19,55 +88,176 @@ TWITTER_ALIAS: Dict[str, list] = {
     "contact.websites": ["external_links"],
 }
 
+@lru_cache(maxsize=1024)
+def _contacts_cached(text_blob: str) -> tuple:
+    """Regex-scan a text blob once per distinct blob — identical bios
+    (reruns, mirrored profiles) hit the cache. Tuples keep the cached
+    value immutable."""
+    c = _contacts(text_blob)
+    return tuple(c["emails"]), tuple(c["phones"])
+
 def _merge_results(meta_results: List[Dict], visual_results: List[Dict]) -> List[Dict]:
-    merged: Dict[str, Dict] = {}
-    for item in meta_results + visual_results:
+    # stream both lists (no concat allocation); defaultdict inserts the
+    # bucket atomically — one hash probe per row, no membership check
+    merged: Dict[str, Dict] = defaultdict(dict)
+    for item in chain(meta_results, visual_results):
         join_key = item.get("twitter_link") or item.get("url")
-        if not join_key: continue
-        if join_key not in merged: merged[join_key] = {}
-        merged[join_key].update(item)
+        if join_key:
+            merged[join_key].update(item)
     return list(merged.values())
 
-def _map_to_schema(raw: Dict, schema: Dict, alias: Dict[str, list]) -> Dict:
-    from copy import deepcopy
-    mapped = deepcopy(schema)
-    for schema_key, possible_keys in alias.items():
-        target = mapped
+# SCHEMA is pure JSON-safe literals, so its repr is a valid dict display;
+# compiling it into a function builds each fresh copy straight from
+# BUILD_MAP/BUILD_LIST opcodes — no deepcopy walk, no serializer round trip
+_ns: Dict = {}
+exec(compile(f"def _fresh():\n    return {SCHEMA!r}", "<schema-template>", "exec"), {}, _ns)
+_fresh_schema = _ns["_fresh"]
+del _ns
+
+def _compile_alias(alias: Dict[str, list]) -> tuple:
+    """Pre-split dotted schema keys into (parents, leaf, possible_keys)
+    so per-row mapping skips the str.split + slicing work."""
+    return tuple(
+        (tuple(schema_key.split(".")[:-1]), schema_key.rsplit(".", 1)[-1], tuple(possible))
+        for schema_key, possible in alias.items()
+    )
+
+def _codegen_apply(alias: Dict[str, list]):
+    """Generate a specialized mapper function from an alias table.
+
+    The generic walker re-interprets the table per row (split keys,
+    nested loops). Inlining the exact assignments into one exec'd
+    function — the same trick hot serializers use — leaves only plain
+    dict gets and stores at call time.
+    """
+    lines = ["def _apply(raw, mapped):"]
+    for schema_key, possible in alias.items():
+        expr = " or ".join(f"raw.get({key!r})" for key in possible)
         parts = schema_key.split(".")
-        for p in parts[:-1]:
-            target = target[p]
+        target = "mapped" + "".join(f"[{p!r}]" for p in parts[:-1])
+        lines.append(f"    v = {expr}")
+        lines.append(f"    if v: {target}[{parts[-1]!r}] = v")
+    namespace: Dict = {}
+    exec("\n".join(lines), {}, namespace)
+    return namespace["_apply"]
+
+_apply_alias = _codegen_apply(TWITTER_ALIAS)
+
+def _map_to_schema(raw: Dict, schema: Dict, alias: Dict[str, list]) -> Dict:
+    if schema is SCHEMA:
+        mapped = _fresh_schema()
+    else:
+        mapped = deepcopy(schema)
+    if alias is TWITTER_ALIAS:
+        _apply_alias(raw, mapped)
+        return mapped
+    # custom alias tables are rare; the generic compiled walker avoids
+    # paying an exec per call. Parent dicts are resolved once per row —
+    # aliases sharing a parent ("profile.*", "contact.*") reuse the
+    # pointer instead of re-walking the clone.
+    ptrs: Dict[tuple, Dict] = {(): mapped}
+    for parents, leaf, possible_keys in _compile_alias(alias):
+        target = ptrs.get(parents)
+        if target is None:
+            target = mapped
+            for p in parents:
+                target = target[p]
+            ptrs[parents] = target
         for key in possible_keys:
-            if key in raw and raw[key]:
-                target[parts[-1]] = raw[key]
+            v = raw.get(key)
+            if v:
+                target[leaf] = v
                 break
     return mapped
 
+async def _scrape_all_one(pool: PagePool, context, url: str, now: int) -> Dict:
+    # the pool doubles as the concurrency cap: acquire blocks until one
+    # of its `size` pre-warmed pages frees up. The API probe runs inside
+    # it too, so api.x.com sees at most `size` requests in flight.
+    page = await pool.acquire()
+    try:
+        result = await _profile_via_api(context, url, now) or {}
+        ok = await goto_resilient(page, url, timeout=NAV_TIMEOUT_MS,
+                                  ready_selector=READY_SEL)
+        if not ok:
+            return result or {"twitter_link": url, "error": "Navigation failed"}
+        if not result:
+            result = await _extract_profile(page, url, now)
+        result.update(tweet_fields(await extract_tweets(page)))
+        return result
+    finally:
+        await pool.release(page)
+
+async def scrape_twitter_all(urls: List[str], context, concurrency: int = 8) -> List[Dict]:
+    """Profile + visible-text scrape with a single navigation per URL.
+
+    The two split scrapers each navigated to every URL; fusing them
+    halves network and render cost. They remain available for callers
+    that only need one half.
+    """
+    norm = [u for u in _dedupe(urls) if _is_twitter(u)]
+    if not norm:
+        return []
+    now = int(time.time())
+    pool = await PagePool(context, size=min(concurrency, len(norm))).start()
+    try:
+        gathered = await asyncio.gather(
+            *[_scrape_all_one(pool, context, u, now) for u in norm],
+            return_exceptions=True,
+        )
+    finally:
+        await pool.close()
+    results: List[Dict] = []
+    for url, res in zip(norm, gathered):
+        if isinstance(res, BaseException):
+            results.append({"twitter_link": url, "error": str(res)})
+        else:
+            results.append(res)
+    return results
+
 async def main(urls: List[str], *, headless: bool = True,
                alias: Optional[Dict[str, list]] = None,
-               schema: Optional[Dict] = None) -> List[Dict]:
-    print(f"--- Starting combined Twitter scrape for {len(urls)} URLs ---")
-    async with async_playwright() as p:
-        browser = await get_browser(p, headless=headless)
-        try:
-            meta_page = await get_stealth_page(browser)
-            visual_page = await get_stealth_page(browser)
-            meta_task = asyncio.create_task(scrape_twitter_profiles_async(urls, page=meta_page))
-            visual_task = asyncio.create_task(scrape_twitter_visible_text_seq(urls, page=visual_page))
-            meta_results, visual_results = await asyncio.gather(meta_task, visual_task)
-        finally:
-            if browser: await browser.close()
+               schema: Optional[Dict] = None,
+               concurrency: int = MAX_PARALLEL) -> List[Dict]:
+    # dedupe at the boundary — a repeated URL would otherwise cost a full
+    # navigation, which dwarfs this O(n) pass
+    original = len(urls)
+    urls = list(dict.fromkeys(urls))
+    if len(urls) != original:
+        print(f"ℹ️ Dropped {original - len(urls)} duplicate URLs")
 
-    print("\n--- Merging Twitter results ---")
-    combined_results = _merge_results(meta_results, visual_results)
+    print(f"--- Starting combined Twitter scrape for {len(urls)} URLs ---")
+    # the browser is shared and stays warm across calls; only the context
+    # (cookies, fingerprint) is per-call and gets torn down here
+    browser = await _get_shared_browser(headless)
+    context = await create_stealth_context(browser)
+    try:
+        # one stealth context, one navigation per URL — profile and
+        # visible-text fields come from the same rendered page
+        combined_results = await scrape_twitter_all(urls, context, concurrency=concurrency)
+    finally:
+        await context.close()
 
     print("\n--- Enriching with contact extraction ---")
     for item in combined_results:
+        if item.get("emails") and item.get("phones"):
+            # the profile scrape already yielded both contact kinds;
+            # re-scanning the text couldn't add anything but duplicates
+            continue
         bio_text = item.get("bio", "")
         tweet_text = item.get("main_tweet_text", "")
+        if not (bio_text or tweet_text):
+            # nothing to scan — error rows and blank profiles skip the
+            # regex pass entirely but still get the contact fields
+            item.setdefault("emails", [])
+            item.setdefault("phones", [])
+            continue
         text_blob = " ".join([bio_text or "", tweet_text or ""])
-        contacts = _contacts(text_blob)
-        item["emails"] = list(set(item.get("emails", []) + contacts["emails"]))
-        item["phones"] = list(set(item.get("phones", []) + contacts["phones"]))
+        emails, phones = _contacts_cached(text_blob)
+        # dict.fromkeys dedupes in one C pass and keeps first-seen order,
+        # so output stays deterministic run to run
+        item["emails"] = list(dict.fromkeys((*(item.get("emails") or ()), *emails)))
+        item["phones"] = list(dict.fromkeys((*(item.get("phones") or ()), *phones)))
 
     print("\n--- Mapping results into schema ---")
     schema_obj = schema or SCHEMA
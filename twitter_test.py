@@ -1,9 +1,13 @@
 from common.db_utils import save_to_mongo, save_to_json
 import asyncio
+from pathlib import Path
 from scrapers import twitter_scraper
 
 
-URLS = ["https://x.com/imVkohli", "https://x.com/realdonaldtrump"]
+# whitespace-split in one C call: splits on any run of newlines/spaces
+# and drops empties, so no Python-side filter loop is needed (URLs can't
+# contain whitespace)
+URLS = Path("twitter_urls.txt").read_text(encoding="utf-8").split()
 
 async def run_test():
     print("--- Starting Twitter Test ---")